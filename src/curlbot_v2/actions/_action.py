@@ -1,15 +1,27 @@
+import hashlib
 import logging
 import sqlite3
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import yaml  # type:ignore[import]
 from praw.reddit import Subreddit  # type:ignore[import]
 from prawcore.exceptions import NotFound  # type:ignore[import]
 
+try:
+    # Much faster, but only available if PyYAML was built with libyaml
+    from yaml import CSafeLoader as SafeLoader  # type:ignore[import]
+except ImportError:
+    from yaml import SafeLoader  # type:ignore[import]
+
 logger = logging.getLogger(__name__)
 
+# Configs already parsed from the wiki, keyed by (subreddit, wiki page), along with a hash of the
+# page content they were parsed from. Lets us skip parsing when the page hasn't changed since last
+# time.
+_parsed_wiki_configs: Dict[Tuple[str, str], Tuple[bytes, Any]] = {}
+
 
 @dataclass(frozen=True)
 class BotActionParams(ABC):
@@ -17,14 +29,14 @@ class BotActionParams(ABC):
 
 
 class BotAction(ABC):
-    _db: sqlite3.Cursor
+    _db: sqlite3.Connection
     _subreddit: Subreddit
 
     @abstractmethod
     def __init__(
         self,
         subreddit: Subreddit,
-        db: Optional[sqlite3.Cursor],
+        db: Optional[sqlite3.Connection],
     ):
         pass
 
@@ -36,9 +48,16 @@ class BotAction(ABC):
         try:
             wiki_page = self._subreddit.wiki[wiki_page_name]
             content = wiki_page.content_md
+            cache_key = (self._subreddit.display_name, wiki_page_name)
+            content_hash = hashlib.blake2b(content.encode(), digest_size=16).digest()
+            cached = _parsed_wiki_configs.get(cache_key)
+            if cached is not None and cached[0] == content_hash:
+                logger.debug("Wiki page '%s' unchanged, reusing its configuration.", wiki_page_name)
+                return cached[1]
             try:
-                config = yaml.safe_load(content)
-                logger.debug(f"CONFIGURATION LOADED (not yet parsed):\n{config}")
+                config = yaml.load(content, Loader=SafeLoader)
+                logger.debug("CONFIGURATION LOADED (not yet parsed):\n%s", config)
+                _parsed_wiki_configs[cache_key] = (content_hash, config)
                 return config
 
             except yaml.YAMLError:
@@ -1,16 +1,20 @@
-import datetime
 import logging
+import re
 import sqlite3
-from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Tuple, Union
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple, Union
 
 from praw.reddit import Submission, Subreddit  # type:ignore[import]
 
 from curlbot_v2._submission_helpers import (
+    TEXT_SEPARATOR,
     add_sticky_comment,
     get_all_op_text,
     get_new_subreddit_posts,
     post_is_an_image,
+    strip_texts,
     time_elapsed_since_post,
 )
 
@@ -19,6 +23,78 @@ from ._action import BotAction, BotActionParams
 logger = logging.getLogger(__name__)
 
 
+def _is_list_of(item_types: Union[type, Tuple[type, ...]]) -> Callable[[Any], bool]:
+    """Make a check for whether a value is a list with every item of the given type(s)."""
+    return lambda value: isinstance(value, list) and all(
+        isinstance(item, item_types) for item in value
+    )
+
+
+def _is_optional_int(value: Any) -> bool:
+    """Check whether a value is an integer or None."""
+    return value is None or isinstance(value, int)
+
+
+# For each parameter, a check of its value and the error to give if it fails (formatted with the
+# value as {value})
+_PARAM_VALIDATORS: Dict[str, Tuple[Callable[[Any], bool], str]] = {
+    "flair_to_check": (
+        _is_list_of((str, type(None))),
+        "flair_to_check parameter should be a list of strings or None values.",
+    ),
+    "remind_after_mins": (
+        _is_optional_int,
+        "remind_after_mins should be an integer or None (given {value}).",
+    ),
+    "remove_after_mins": (
+        _is_optional_int,
+        "remove_after_mins should be an integer or None (given {value}).",
+    ),
+    "report_after_mins": (
+        _is_optional_int,
+        "report_after_mins should be an integer or None (given {value}).",
+    ),
+    "keywords": (_is_list_of(str), "keywords parameter should be a list of strings."),
+    "min_routine_characters": (
+        lambda value: isinstance(value, int) and value >= 0,
+        "min_routine_characters should be a non-negative integer.",
+    ),
+    "sidestepping_phrases": (
+        _is_list_of(str),
+        "sidestepping_phrases parameter should be a list of strings.",
+    ),
+    "max_posts": (
+        lambda value: isinstance(value, int) and value > 0,
+        "max_posts should be a positive integer.",
+    ),
+    "reminder_messages_by_flair": (
+        lambda value: isinstance(value, dict),
+        "reminder_messages_by_flair should be a dictionary.",
+    ),
+}
+
+# Parameters that have to be in the wiki config (every parameter with a check above)
+_REQUIRED_PARAMS = tuple(_PARAM_VALIDATORS)
+
+
+def _compile_phrases(phrases: List[str]) -> "re.Pattern[str]":
+    """Compile a list of phrases into one pattern that matches if any of them appear in a text.
+
+    Empty phrases are left out, since they'd match every text. (A phrase that's only punctuation,
+    like "?!", is empty once it's been stripped.)
+
+    Args:
+        phrases (List[str]): phrases to look for, matched literally
+
+    Returns:
+        re.Pattern[str]: pattern to `search` texts with. Never matches if there are no phrases.
+    """
+    phrases = [phrase for phrase in phrases if phrase]
+    if not phrases:
+        return re.compile(r"(?!)")
+    return re.compile("|".join(re.escape(phrase) for phrase in phrases))
+
+
 @dataclass(frozen=True)
 class RoutineCheckerParams(BotActionParams):
     """Holds parameters for the RoutineChecker bot action.
@@ -84,14 +160,14 @@ class RoutineCheckerParams(BotActionParams):
         return s
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PostState:
     """Helper to record a post's state at the time this object was generated.
 
-    Intentionally can't be updated directly - use the update_x() functions for that. This is to
-    control access to these variables (no accidental modification) without having to manually
-    recreate a new PostState each time we want to modify something. This helped me keep things
-    consistent when doing development and I hope it makes it easier for the future.
+    Intentionally can't be updated directly - use dataclasses.replace() to get a modified copy.
+    This is to control access to these variables (no accidental modification) without having to
+    manually recreate a new PostState each time we want to modify something. This helped me keep
+    things consistent when doing development and I hope it makes it easier for the future.
 
     Args:
         post_id (str): Reddit post ID
@@ -114,98 +190,8 @@ class PostState:
     removed_utc: int
     reported_utc: int
 
-    def __post_init__(self) -> None:
-        """Provides some validation beyond optional type checking."""
-        assert type(self.post_id) is str
-        assert type(self.post_in_database) is bool
-        assert type(self.needs_routine_per_requirements) is bool
-        assert type(self.has_routine) is bool
-        assert type(self.stop_checking) is bool
-        assert type(self.reminded_utc) is int
-        assert type(self.removed_utc) is int
-        assert type(self.reported_utc) is int
-
-    def update_needs_routine(self, needs_routine: bool) -> "PostState":
-        """Update the field "needs_routine_per_requirements" and return a new copy of this object.
 
-        Args:
-            needs_routine (bool): Whether the post requires a routine per the rules
-
-        Returns:
-            PostState: Same as self, but with an updated field
-        """
-        vars = self.__dict__
-        vars["needs_routine_per_requirements"] = needs_routine
-        return PostState(**vars)
-
-    def update_has_routine(self, has_routine: bool) -> "PostState":
-        """Update the field "has_routine" and return a new copy of this object.
-
-        Args:
-            has_routine (bool): Whether the post has a routine already
-
-        Returns:
-            PostState: Same as self, but with an updated field
-        """
-        vars = self.__dict__
-        vars["has_routine"] = has_routine
-        return PostState(**vars)
-
-    def update_stop_checking(self, stop_checking: bool) -> "PostState":
-        """Update the field "stop_checking" and return a new copy of this object.
-
-        Args:
-            stop_checking (bool): Whether or not we've stopped checking this post
-
-        Returns:
-            PostState: Same as self, but with an updated field
-        """
-        vars = self.__dict__
-        vars["stop_checking"] = stop_checking
-        return PostState(**vars)
-
-    def update_reminded_utc(self, reminded_utc: int) -> "PostState":
-        """Update the field "reminded_utc" and return a new copy of this object.
-
-        Args:
-            reminded_utc (int):The time at which this post was sent a reminder sticky, as a UTC
-                integer timestamp.
-
-        Returns:
-            PostState: Same as self, but with an updated field
-        """
-        vars = self.__dict__
-        vars["reminded_utc"] = reminded_utc
-        return PostState(**vars)
-
-    def update_removed_utc(self, removed_utc: int) -> "PostState":
-        """Update the field "removed_utc" and return a new copy of this object.
-
-        Args:
-            removed_utc (int): The time at which this post was removed, as a UTC integer timestamp.
-
-        Returns:
-            PostState: Same as self, but with an updated field
-        """
-        vars = self.__dict__
-        vars["removed_utc"] = removed_utc
-        return PostState(**vars)
-
-    def update_reported_utc(self, reported_utc: int) -> "PostState":
-        """Update the field "reported_utc" and return a new copy of this object.
-
-        Args:
-            reported_utc (int):The time at which this post was reported, as a UTC integer timestamp.
-
-        Returns:
-            PostState: Same as self, but with an updated field
-        """
-        vars = self.__dict__
-        vars["reported_utc"] = reported_utc
-        return PostState(**vars)
-
-
-@dataclass
+@dataclass(slots=True)
 class RoutineErrors:
     """Class to help keep track of issues with someone's typed out routine, compare which errors
     are better/worse, and summarizing the errors for a report message.
@@ -233,15 +219,14 @@ class RoutineErrors:
         Returns:
             bool: True if self is better, False if they're tied or other is better
         """
-        # If self has a comment and the other doesn't, this one is better by default
-        if self.comment and not other.comment:
-            return True
-        elif other.comment and not self.comment:
-            return False
-        # Otherwise, check how many errors they have and pick the lower one
-        n_errs_self = self.avoiding_routine + self.too_short
-        n_errs_other = other.avoiding_routine + other.too_short
-        return n_errs_self < n_errs_other
+        return self._score > other._score
+
+    @property
+    def _score(self) -> int:
+        """Integer ranking of how good this is. Having a comment at all outweighs any number of
+        errors, and after that each error counts the same (None counts as no error).
+        """
+        return 4 * bool(self.comment) - bool(self.avoiding_routine) - bool(self.too_short)
 
     def summarize_errors(self) -> str:
         """Returh a different error message depending on which errors are set.
@@ -267,33 +252,64 @@ class RoutineChecker(BotAction):
     _params: RoutineCheckerParams
     _subreddit: Subreddit
     _subreddit_url: str
-    _db: sqlite3.Cursor
+    _db: sqlite3.Connection
+    _flair_to_check: FrozenSet[Optional[str]]
+    _min_routine_characters: int
+    _ignore_posts_over_age_mins: float
+    _param_dict: Dict[str, Any]
+    _params_checked_at: float
+    # When the flair was last listed, and the text of each flair
+    _valid_link_flairs: Optional[Tuple[float, FrozenSet[str]]] = None
+    _keyword_pattern: "re.Pattern[str]"
+    _sidestepper_pattern: "re.Pattern[str]"
     _DB_TABLE_NAME: str = "post_history"
     _WIKI_CONFIG_PAGE: str = "routine_checker_config"
+    # How long to go between checking the wiki for config changes
+    _CONFIG_TTL_SECS: float = 120
+    # How long to go between listing the subreddit's flair (in case mods add new ones)
+    _FLAIR_TTL_SECS: float = 300
+
+    # SQL is built once, with placeholders for the values, so sqlite's statement cache can reuse
+    # the compiled statements instead of parsing new SQL for every post
+    _SQL_SELECT_POSTS: str = (
+        "SELECT id, url, created_utc, needs_routine, has_routine, reminded_utc, removed_utc, "
+        f"reported_utc, case_closed FROM {_DB_TABLE_NAME} WHERE id IN ({{placeholders}})"
+    )
+    # Older sqlite builds cap a statement at 999 bound parameters
+    _SQL_MAX_PARAMS: int = 999
+    _SQL_INSERT_POST: str = f"INSERT INTO {_DB_TABLE_NAME} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    _SQL_UPDATE_POST: str = (
+        f"UPDATE {_DB_TABLE_NAME} SET needs_routine = ?, has_routine = ?, reminded_utc = ?, "
+        "removed_utc = ?, reported_utc = ?, case_closed = ? WHERE id = ?"
+    )
 
     def __init__(
         self,
         subreddit: Subreddit,
-        db: sqlite3.Cursor,
+        db: sqlite3.Connection,
     ) -> None:
         """RoutineChecker TODO checks new image posts in a subreddit to see if they fulfill some criteria.
 
         Args:
             subreddit (Subreddit): Instantiated & authenticated subreddit object. (Note: you can
                 get the reddit object from this if needed)
-            db (sqlite3.Cursor): Instantiated database. We'll use a table within this database to
-                track posts over time.
+            db (sqlite3.Connection): Instantiated database. We'll use a table within this database
+                to track posts over time.
         """
         self._subreddit = subreddit
         self._subreddit_url = f"https://www.reddit.com/r/{self._subreddit.display_name}"
         self._db = self._set_up_db(db, self._DB_TABLE_NAME)
+        self._check_query_plan()
 
         # Get the parameters from the wiki and make sure they're valid
         param_dict = self._get_config_from_wiki(self._WIKI_CONFIG_PAGE)
         self._validate_config(param_dict)
-        self._params = RoutineCheckerParams(**param_dict)
-        self._validate_flair_messages(self._params)
-        logger.debug(f"Config loaded and parsed: \n{self._params}")
+        params = RoutineCheckerParams(**param_dict)
+        self._validate_flair_messages(params)
+        self._load_params(params)
+        self._param_dict = param_dict
+        self._params_checked_at = time.monotonic()
+        logger.debug("Config loaded and parsed: \n%s", self._params)
 
     def run(self) -> None:
         """Runs the RoutineChecker logic -- pulls the config from the wiki, checks new posts for
@@ -303,125 +319,167 @@ class RoutineChecker(BotAction):
         """
         logger.debug("Running RoutineChecker!")
 
-        # Pull the parameters again, so we pick up any changes live
+        self._reload_params()
+
+        posts = get_new_subreddit_posts(self._subreddit, self._params.max_posts)
+        # Use the same "now" for every post in this run rather than reading the clock per post
+        now_utc = time.time()
+        # Posts that are too old or have flair we don't check will never need action, so don't
+        # spend any database work on them
+        cutoff_utc = now_utc - self._ignore_posts_over_age_mins * 60
+        posts = [
+            post
+            for post in posts
+            if post.created_utc >= cutoff_utc and post.link_flair_text in self._flair_to_check
+        ]
+        # Looking up the posts also inserts any new ones, so do it all in one transaction
+        with self._write_transaction():
+            previous_post_states = self._get_post_states_from_database(posts)
+
+        # Previous & new states of the posts we checked, to write to the db all at once
+        checked_db_post_states: List[PostState] = []
+        checked_post_states: List[PostState] = []
+        # OP's text for each post, fetched at most once per run. OP may have commented since the
+        # last run, so this starts out empty every time.
+        op_text_by_post_id: Dict[str, List[str]] = {}
+        try:
+            for post, previous_post_state in zip(posts, previous_post_states):
+                # Case closed already - stop checking this post & move on
+                if previous_post_state.stop_checking:
+                    continue
+
+                # Check if the post needs a routine (and if we should continue checking this post)
+                new_post_state = self._check_post(post, previous_post_state, op_text_by_post_id)
+
+                # Stopped checking this post - update database & move on
+                # We could've stopped checking for several reasons - doesn't need a routine, etc.
+                if new_post_state.stop_checking:
+                    checked_db_post_states.append(previous_post_state)
+                    checked_post_states.append(new_post_state)
+                    continue
+
+                # If the post needs a routine & doesn't have one
+                if (
+                    new_post_state.needs_routine_per_requirements
+                    and not new_post_state.has_routine
+                ):
+                    logger.debug("new_post_state=%s", new_post_state)
+                    # Remind/report/remove if it's time to do so
+                    new_post_state = self._remind_remove_report(
+                        post, new_post_state, now_utc, op_text_by_post_id
+                    )
+
+                # Update the database with new info about whether we took action
+                checked_db_post_states.append(previous_post_state)
+                checked_post_states.append(new_post_state)
+        finally:
+            # Reminders, removals, and reports can't be undone, so even if a post partway through
+            # raised, save what happened to the posts before it (otherwise they'd get acted on
+            # again next run)
+            with self._write_transaction():
+                self._update_db(checked_db_post_states, checked_post_states)
+
+    def _reload_params(self) -> None:
+        """Pull the parameters from the wiki again, so we pick up any changes live. The wiki is
+        checked at most every `_CONFIG_TTL_SECS`, and the config isn't re-validated if it's the
+        same one we're already using. If the new parameters aren't valid, we keep the old ones and
+        try the new ones again next time (they may only be invalid because a flair was added on
+        reddit after we last listed the flairs).
+        """
+        now = time.monotonic()
+        if now - self._params_checked_at < self._CONFIG_TTL_SECS:
+            return
+        self._params_checked_at = now
+
         param_dict = self._get_config_from_wiki(self._WIKI_CONFIG_PAGE)
+        if param_dict is self._param_dict:
+            # Same page content as the config we're using, so it was already validated
+            return
         try:
             self._validate_config(param_dict)
             params = RoutineCheckerParams(**param_dict)
             self._validate_flair_messages(params)
-            self._params = params
-            logger.debug(f"Config loaded and parsed: \n{self._params}")
+            self._load_params(params)
+            self._param_dict = param_dict
+            logger.debug("Config loaded and parsed: \n%s", self._params)
         except AssertionError as e:
             logger.error(f"Issue with the flair messages (not updating params): {e}")
         except ValueError as e:
             logger.error(f"Issue with the parameters (not updated): {e}")
 
-        posts = get_new_subreddit_posts(self._subreddit, self._params.max_posts)
-        for post in posts:
-            previous_post_state = self._get_post_state_from_database(post)
-
-            # Case closed already - stop checking this post & move on
-            if previous_post_state.stop_checking:
-                continue
+    def _load_params(self, params: RoutineCheckerParams) -> None:
+        """Start using the given (already validated) parameters, and precompute anything derived
+        from them so it isn't redone for every post.
 
-            # Check if the post needs a routine (and if we should continue checking this post)
-            new_post_state = self._check_post(post, previous_post_state)
-
-            # Stopped checking this post - update database & move on
-            # We could've stopped checking for several reasons - doesn't need a routine, etc.
-            if new_post_state.stop_checking:
-                self._update_db(previous_post_state, new_post_state)
-                continue
+        Args:
+            params (RoutineCheckerParams): parameters to use from now on
+        """
+        self._params = params
+        self._flair_to_check = frozenset(params.flair_to_check)
+        # No minimum (None or 0) is the same as a minimum of 0 characters
+        self._min_routine_characters = params.min_routine_characters or 0
+        self._ignore_posts_over_age_mins = params.ignore_posts_over_age_hours * 60
+        # OP's text is lowercased with punctuation stripped, so the phrases have to be too
+        self._keyword_pattern = _compile_phrases(strip_texts(params.keywords))
+        self._sidestepper_pattern = _compile_phrases(strip_texts(params.sidestepping_phrases))
 
-            # If the post needs a routine & doesn't have one
-            if new_post_state.needs_routine_per_requirements and not new_post_state.has_routine:
-                logger.debug(f"{new_post_state=}")
-                # Remind/report/remove if it's time to do so
-                new_post_state = self._remind_remove_report(post, new_post_state)
+    def _validate_config(self, config: Dict[str, Any]) -> None:
+        """Check that the config from the wiki has every parameter, with the right types, before
+        it's turned into RoutineCheckerParams. All the problems are collected and raised together
+        so they can be fixed in one edit.
 
-            # Update the database with new info about whether we took action
-            self._update_db(previous_post_state, new_post_state)
+        Args:
+            config (Dict[str, Any]): parameters parsed from the wiki
 
-    def _validate_config(self, config: Dict[str, Any]) -> None:
-        # TODO maybe make this part of the parameters (making the dict into the object & validating)
-        errors = []
-        required_params = [
-            "flair_to_check",
-            "remind_after_mins",
-            "remove_after_mins",
-            "report_after_mins",
-            "keywords",
-            "min_routine_characters",
-            "sidestepping_phrases",
-            "max_posts",
-            "reminder_messages_by_flair",
-        ]
-        missing_params = []
-        for param in required_params:
-            if param not in config:
-                missing_params.append(param)
+        Raises:
+            ValueError: Raised if any parameters are missing or invalid
+        """
+        missing_params = [param for param in _REQUIRED_PARAMS if param not in config]
         if len(missing_params) > 0:
             raise ValueError(f"Parameter(s) '{missing_params=}' are missing from the config.")
 
-        # Check the type of the flair variable
-        if not isinstance(config["flair_to_check"], list) or not all(
-            isinstance(item, (str, type(None))) for item in config["flair_to_check"]
-        ):
-            e = "flair_to_check parameter should be a list of strings or None values."
-            logger.error(e)
-            errors.append(e)
-
-        # Check if all values are valid link flairs
-        # First, get the list of valid flairs
-        valid_link_flairs = []
-        for flair in self._subreddit.flair.link_templates:
-            valid_link_flairs.append(flair["text"])
-        # Then check the flairs specified here against the valid flairs
-        flairs_to_check = config.get("flair_to_check")
-        for flair in flairs_to_check:
-            if flair not in valid_link_flairs and flair is not None:
-                e = f"Flair {flair} not valid. Valid flairs: {valid_link_flairs}"
+        errors = []
+        for param, value in config.items():
+            validator = _PARAM_VALIDATORS.get(param)
+            if validator is None:
+                continue
+            is_valid, message = validator
+            if not is_valid(value):
+                e = message.format(value=value)
                 logger.error(e)
                 errors.append(e)
 
-        for time_param in ["remind_after_mins", "remove_after_mins", "report_after_mins"]:
-            if config[time_param] is not None and not isinstance(config[time_param], int):
-                e = f"{time_param} should be an integer or None (given {config[time_param]})."
-                logger.error(e)
-                errors.append(e)
+        # Check if all values are valid link flairs
+        valid_link_flairs = self._get_valid_link_flairs()
+        flairs_to_check = config["flair_to_check"]
+        # If it's not a list, that's already been reported above
+        if isinstance(flairs_to_check, list):
+            for flair in flairs_to_check:
+                if flair not in valid_link_flairs and flair is not None:
+                    e = f"Flair {flair} not valid. Valid flairs: {sorted(valid_link_flairs)}"
+                    logger.error(e)
+                    errors.append(e)
         # TODO add more validation for the timing
 
-        if not isinstance(config["keywords"], list) or not all(
-            isinstance(keyword, str) for keyword in config["keywords"]
-        ):
-            e = "keywords parameter should be a list of strings."
-            logger.error(e)
-            errors.append(e)
+        if len(errors) > 0:
+            raise ValueError(" ".join(errors))
 
-        if (
-            not isinstance(config["min_routine_characters"], int)
-            or config["min_routine_characters"] < 0
-        ):
-            e = "min_routine_characters should be a non-negative integer."
-            logger.error(e)
-            errors.append(e)
+    def _get_valid_link_flairs(self) -> FrozenSet[str]:
+        """Text of every link flair set up in the subreddit. Listing the flair templates is a call
+        to reddit, so the result is reused for `_FLAIR_TTL_SECS` rather than fetched every time
+        the config is validated.
 
-        if not isinstance(config["sidestepping_phrases"], list) or not all(
-            isinstance(phrase, str) for phrase in config["sidestepping_phrases"]
+        Returns:
+            FrozenSet[str]: text of each link flair
+        """
+        now = time.monotonic()
+        if (
+            self._valid_link_flairs is None
+            or now - self._valid_link_flairs[0] > self._FLAIR_TTL_SECS
         ):
-            e = "sidestepping_phrases parameter should be a list of strings."
-            logger.error(e)
-            errors.append(e)
-
-        if not isinstance(config["max_posts"], int) or config["max_posts"] <= 0:
-            e = "max_posts should be a positive integer."
-            logger.error(e)
-            errors.append(e)
-
-        if not isinstance(config["reminder_messages_by_flair"], dict):
-            e = "reminder_messages_by_flair should be a dictionary."
-            logger.error(e)
-            errors.append(e)
+            flairs = frozenset(flair["text"] for flair in self._subreddit.flair.link_templates)
+            self._valid_link_flairs = (now, flairs)
+        return self._valid_link_flairs[1]
 
     def _validate_flair_messages(self, params: RoutineCheckerParams) -> None:
         """Check that, if reminders are on, each flair we're checking has a canned sticky message
@@ -440,7 +498,13 @@ class RoutineChecker(BotAction):
             flair_with_messages = set(flair_messages.keys())
             assert flair_with_messages.issuperset(flair_to_check)  # TODO better message
 
-    def _remind_remove_report(self, post: Submission, post_state: PostState) -> PostState:
+    def _remind_remove_report(
+        self,
+        post: Submission,
+        post_state: PostState,
+        now_utc: Optional[float] = None,
+        op_text_by_post_id: Optional[Dict[str, List[str]]] = None,
+    ) -> PostState:
         """For the given post, remind, remove, and/or report it if it's due for any of those
         actions. We'll call this on a post if we know it doesn't have a routine yet, and may need
         to take some kind of action.
@@ -449,12 +513,19 @@ class RoutineChecker(BotAction):
             post (Submission): post that needs reminding/removing/reporting
             post_state (PostState): history of what's happened with the post (we'll read this and
                 add to it here)
+            now_utc (Optional[float], optional): Current unix time, so a whole run can share one
+                snapshot. Defaults to None (read the clock now).
+            op_text_by_post_id (Optional[Dict[str, List[str]]], optional): OP's text for posts
+                already fetched this run, keyed by post id. The post's text is added to it if it
+                has to be fetched. Defaults to None (always fetch).
 
         Returns:
             PostState: Updated state of the post
         """
-        time_since_post_mins = time_elapsed_since_post(post)
-        time_right_now_utc = int(datetime.datetime.utcnow().timestamp())
+        if now_utc is None:
+            now_utc = time.time()
+        time_since_post_mins = time_elapsed_since_post(post, now_utc)
+        time_right_now_utc = int(now_utc)
         remind_after_mins = self._params.remind_after_mins
         remove_after_mins = self._params.remove_after_mins
         report_after_mins = self._params.report_after_mins
@@ -466,17 +537,38 @@ class RoutineChecker(BotAction):
             post_state.stop_checking is False
         ), "Called _remind_remove_report but it says case closed."
 
+        # Find the longest time from remind/remove/report
+        time_values = [
+            mins
+            for mins in [remind_after_mins, remove_after_mins, report_after_mins]
+            if mins is not None
+        ]
+        max_time_mins = max(time_values) if time_values else None
+        past_all_actions = max_time_mins is None or time_since_post_mins > max_time_mins
+
+        # If it's been an unfairly long time (at some point, if we missed it we missed it), don't
+        # take any action on the post
+        if self._post_is_over_time_limit(time_since_post_mins):
+            logger.debug(
+                "Too much time has passed for post %s (%0.1f mins), not taking any action.",
+                post.id,
+                time_since_post_mins,
+            )
+            return replace(post_state, stop_checking=past_all_actions)
+
         stop_checking = False
-        been_too_long = self._post_is_over_time_limit(post)
+        # %-style so the messages are only formatted if debug logging is on
         logger.debug(
-            f"REMIND is {'on' if remind_mode_on else 'off'}; "
-            f"REMOVE is {'on' if remove_mode_on else 'off'}; "
-            f"REPORT is {'on' if remove_mode_on else 'off'}"
+            "REMIND is %s; REMOVE is %s; REPORT is %s",
+            "on" if remind_mode_on else "off",
+            "on" if remove_mode_on else "off",
+            "on" if report_mode_on else "off",
         )
         logger.debug(
-            f"REMIND - {remind_after_mins} mins; "
-            f"REMOVE - {remove_after_mins} mins; "
-            f"REPORT - {report_after_mins} mins"
+            "REMIND - %s mins; REMOVE - %s mins; REPORT - %s mins",
+            remind_after_mins,
+            remove_after_mins,
+            report_after_mins,
         )
 
         # Send reminder if...
@@ -484,14 +576,12 @@ class RoutineChecker(BotAction):
         # * AND we haven't sent a reminder yet
         # * AND it's due for a reminder
         # * AND it's not yet time to remove it
-        # * AND it hasn't been an unfairly long amount of time (at some point, if we missed it we missed it)
         reminded_utc = post_state.reminded_utc
         if remind_mode_on:
             if (
                 reminded_utc <= 0  # We haven't sent a reminder yet
                 and time_since_post_mins > remind_after_mins  # Reminder is due
                 and time_since_post_mins < remove_after_mins  # Removal is NOT due
-                and not been_too_long
             ):
                 # Send reminder via sticky message
                 sticky_msg = self._get_sticky_message_for_flair(post.link_flair_text)
@@ -509,13 +599,15 @@ class RoutineChecker(BotAction):
                 # and time_since_post_mins < remove_after_mins  # Removal is NOT due
             ):
                 logger.debug(
-                    f"Didn't remind for post {post.id} because removal was due (elapsed time: "
-                    f"{time_since_post_mins:0.1f} mins)"
+                    "Didn't remind for post %s because removal was due (elapsed time: %0.1f mins)",
+                    post.id,
+                    time_since_post_mins,
                 )
             else:
                 logger.debug(
-                    f"Didn't remind for post {post.id} (elapsed time: "
-                    f"{time_since_post_mins:0.1f} mins)"
+                    "Didn't remind for post %s (elapsed time: %0.1f mins)",
+                    post.id,
+                    time_since_post_mins,
                 )
 
         # Remove the post if...
@@ -523,7 +615,6 @@ class RoutineChecker(BotAction):
         # * it's due to be removed
         # * it hasn't already been removed
         # * we sent a reminder (i.e. don't remove if it bugged out and didn't send a reminder)
-        # * it hasn't been an unfairly long time (if we didn't catch it in X hours, that's on us)
         removed_utc = post_state.removed_utc
         if remove_mode_on:
             if (
@@ -532,7 +623,6 @@ class RoutineChecker(BotAction):
                 and (
                     reminded_utc > 0 or not remind_mode_on
                 )  # We sent a reminder already (if reminders are on)
-                and not been_too_long  # It hasn't been an unfairly long time
             ):
                 post.mod.remove()
                 removed_utc = time_right_now_utc
@@ -540,29 +630,22 @@ class RoutineChecker(BotAction):
                     f"Removed post: {self._subreddit_url}/comments/{post.id} (elapsed time: "
                     f"{time_since_post_mins:0.1f} mins)"
                 )
-            if been_too_long:
-                logger.debug(
-                    f"Too much time has passed for post {post.id} ({time_since_post_mins:0.1f} mins), "
-                    "but it would've been removed."
-                )
 
         # Report the post if...
         # * the "report" option is on
         # * it hasn't already been reported
         # * it's due to be reported
-        # * it hasn't been an unfairly long time
         reported_utc = post_state.reported_utc
         if report_mode_on:
             if (
                 reported_utc <= 0  # We haven't reported it yet
                 and time_since_post_mins > report_after_mins  # Due to be reported
-                and not been_too_long
             ):
                 logger.info(
                     f"Reported post: {self._subreddit_url}/comments/{post.id} (elapsed time: "
                     f"{time_since_post_mins:0.1f} mins)"
                 )
-                op_cms = get_all_op_text(post)
+                op_cms = self._get_op_text(post, op_text_by_post_id)
                 if len(op_cms) > 0:
                     msg = (
                         f">{time_since_post_mins:0.1f} mins and *possibly* no routine. (OP commented "
@@ -578,24 +661,18 @@ class RoutineChecker(BotAction):
 
         # Report the post for manual processing if it's been too long
         # (Meaning it's past time for any action, but not "too long" to check per the parameter)
-        time_values = [  # Find the longest time from remind/remove/report
-            time
-            for time in [remind_after_mins, remove_after_mins, report_after_mins]
-            if time is not None
-        ]
-        max_time_mins = max(time_values) if time_values else None
-        if time_since_post_mins > max_time_mins and not been_too_long:
-            post.report(f"> {max_time_mins} mins and *possibly* no routine. Please check!")
-            reported_utc = time_right_now_utc
-            stop_checking = True
-        elif time_since_post_mins > max_time_mins:
+        if past_all_actions:
+            if max_time_mins is not None:
+                post.report(f"> {max_time_mins} mins and *possibly* no routine. Please check!")
+                reported_utc = time_right_now_utc
             stop_checking = True
 
-        post_state = (
-            post_state.update_stop_checking(stop_checking)
-            .update_reminded_utc(reminded_utc)
-            .update_removed_utc(removed_utc)
-            .update_reported_utc(reported_utc)
+        post_state = replace(
+            post_state,
+            stop_checking=stop_checking,
+            reminded_utc=reminded_utc,
+            removed_utc=removed_utc,
+            reported_utc=reported_utc,
         )
 
         return post_state
@@ -623,58 +700,99 @@ class RoutineChecker(BotAction):
         Returns:
             PostState: Current state of the post in the database
         """
-        logger.debug(f"Attempting to retrieve post {post.id} from database.")
-        db_posts = self._db.execute(
-            f"""SELECT * FROM {self._DB_TABLE_NAME} WHERE id=? ORDER BY created_utc DESC""",
-            (post.id,),
-        ).fetchall()
-        if len(db_posts) > 1:
-            # Error state: too many posts in db with this ID
-            e = f">1 post with this id ({post.id}) found in the db (table {self._DB_TABLE_NAME})."
-            logger.error(e)
-            raise ValueError(e)
-        elif len(db_posts) == 0:
-            # Post not in database. Create a PostState object and insert it in the database
-            logger.debug(f"Post {post.id} not found in database.")
-            post_state = PostState(
-                post_id=post.id,
-                post_in_database=False,
-                needs_routine_per_requirements=False,  # Not meaningful
-                has_routine=False,  # Not meaningful
-                stop_checking=False,
-                reminded_utc=-1,
-                removed_utc=-1,
-                reported_utc=-1,
-            )
-            self._insert_db(post, post_state)
-            return post_state
-        else:
-            logger.debug("Found post in database.")
-            # Post is in database. Create a PostState object from the database entry and return it
-            (
-                post_id,
-                url,
-                created_utc,
-                needs_routine,
-                has_routine,
-                reminded_utc,
-                removed_utc,
-                reported_utc,
-                case_closed,
-            ) = db_posts[0]
-            post_state = PostState(
-                post_id,
-                post_in_database=True,
-                needs_routine_per_requirements=bool(needs_routine),
-                has_routine=bool(has_routine),
-                stop_checking=bool(case_closed),
-                reminded_utc=reminded_utc,
-                removed_utc=removed_utc,
-                reported_utc=reported_utc,
-            )
-            return post_state
+        return self._get_post_states_from_database([post])[0]
+
+    def _get_post_states_from_database(self, posts: List[Submission]) -> List[PostState]:
+        """Same as _get_post_state_from_database, but for many posts at once. All the posts are
+        looked up with one query (per `_SQL_MAX_PARAMS` posts) instead of one query per post.
+
+        Args:
+            posts (List[Submission]): Posts to retrieve from the db
+
+        Returns:
+            List[PostState]: Current state of each post in the database, in the same order
+
+        Raises:
+            ValueError: Raised if more than one row in the database has the same post id
+        """
+        post_ids = [post.id for post in posts]
+        logger.debug("Attempting to retrieve %d posts from database.", len(post_ids))
+        post_states_by_id: Dict[str, PostState] = {}
+        for start in range(0, len(post_ids), self._SQL_MAX_PARAMS):
+            chunk = post_ids[start : start + self._SQL_MAX_PARAMS]
+            sql = self._SQL_SELECT_POSTS.format(placeholders=", ".join("?" * len(chunk)))
+            for row in self._db.execute(sql, chunk):
+                post_id = row[0]
+                if post_id in post_states_by_id:
+                    # Error state: too many posts in db with this ID
+                    e = (
+                        f">1 post with this id ({post_id}) found in the db "
+                        f"(table {self._DB_TABLE_NAME})."
+                    )
+                    logger.error(e)
+                    raise ValueError(e)
+                post_states_by_id[post_id] = self._post_state_from_row(row)
+
+        new_posts = []
+        for post in posts:
+            if post.id not in post_states_by_id:
+                # Post not in database. Create a PostState object and insert it in the database
+                logger.debug("Post %s not found in database.", post.id)
+                post_state = PostState(
+                    post_id=post.id,
+                    post_in_database=False,
+                    needs_routine_per_requirements=False,  # Not meaningful
+                    has_routine=False,  # Not meaningful
+                    stop_checking=False,
+                    reminded_utc=-1,
+                    removed_utc=-1,
+                    reported_utc=-1,
+                )
+                new_posts.append(post)
+                post_states_by_id[post.id] = post_state
+        if new_posts:
+            self._insert_db(new_posts, [post_states_by_id[post.id] for post in new_posts])
+        return [post_states_by_id[post.id] for post in posts]
+
+    def _post_state_from_row(self, row: Tuple[Any, ...]) -> PostState:
+        """Format a row from the database (as selected by `_SQL_SELECT_POSTS`) into a PostState.
+
+        Args:
+            row (Tuple[Any, ...]): Row from the database
+
+        Returns:
+            PostState: State of the post in that row
+        """
+        (
+            post_id,
+            url,
+            created_utc,
+            needs_routine,
+            has_routine,
+            reminded_utc,
+            removed_utc,
+            reported_utc,
+            case_closed,
+        ) = row
+        # sqlite hands back whatever types were stored, so coerce them here where the data comes
+        # into the bot (a NULL timestamp will raise a TypeError)
+        return PostState(
+            str(post_id),
+            post_in_database=True,
+            needs_routine_per_requirements=bool(needs_routine),
+            has_routine=bool(has_routine),
+            stop_checking=bool(case_closed),
+            reminded_utc=int(reminded_utc),
+            removed_utc=int(removed_utc),
+            reported_utc=int(reported_utc),
+        )
 
-    def _check_post(self, post: Submission, previous_post_state: PostState) -> PostState:
+    def _check_post(
+        self,
+        post: Submission,
+        previous_post_state: PostState,
+        op_text_by_post_id: Optional[Dict[str, List[str]]] = None,
+    ) -> PostState:
         """Check whether the post needs/has a routine. If not needed, we'll stop further checking.
         We'll check whether the routine is required regardless of what the status was before -
         sometimes the flair changes, changing the requirements.
@@ -682,6 +800,9 @@ class RoutineChecker(BotAction):
         Args:
             post (Submission): post to check
             previous_post_state (PostState): All the info we already had on this post from the db
+            op_text_by_post_id (Optional[Dict[str, List[str]]], optional): OP's text for posts
+                already fetched this run, keyed by post id. The post's text is added to it if it
+                has to be fetched. Defaults to None (always fetch).
 
         Returns:
             PostState: Post state with updated info, like whether they added their routine since
@@ -690,7 +811,7 @@ class RoutineChecker(BotAction):
 
         # Check if the post NEEDS a routine. Don't use db flag for this - flair could have changed!
         needs_routine = self._post_needs_routine(post)
-        post_state = previous_post_state.update_needs_routine(needs_routine)
+        post_state = replace(previous_post_state, needs_routine_per_requirements=needs_routine)
 
         if needs_routine:
             # Check if the post HAS a routine / meets requirements
@@ -698,8 +819,8 @@ class RoutineChecker(BotAction):
                 post_meets_reqs = True
                 errors = None
             else:
-                post_meets_reqs, errors = self._post_meets_requirements(post)
-                post_state = post_state.update_has_routine(post_meets_reqs)
+                post_meets_reqs, errors = self._post_meets_requirements(post, op_text_by_post_id)
+                post_state = replace(post_state, has_routine=post_meets_reqs)
 
             # Check the errors
             # Special case! Has a routine but trying to cheat - report & keep checking
@@ -710,30 +831,30 @@ class RoutineChecker(BotAction):
 
             # If the post has a routine, we can mark it to stop checking in the future
             if post_meets_reqs:
-                post_state = post_state.update_stop_checking(True)
+                post_state = replace(post_state, stop_checking=True)
         else:
-            post_state = post_state.update_stop_checking(True)
+            post_state = replace(post_state, stop_checking=True)
         return post_state
 
-    def _post_is_over_time_limit(self, post: Submission) -> bool:
+    def _post_is_over_time_limit(self, time_since_post_mins: float) -> bool:
         """Check if we should stop checking for a routine based on how long it's been since the
         post was created.
 
         Args:
-            post (Submission): post to check
+            time_since_post_mins (float): minutes since the post was created (already computed by
+                the caller, so we don't look at the clock again)
 
         Returns:
             bool: True if we should stop checking the post based on how long it's been since the
                 post was created, otherwise false
         """
-        time_since_post = time_elapsed_since_post(post)
-        ignore_posts_over_age_mins = self._params.ignore_posts_over_age_hours * 60
-        logger.debug(f"{time_since_post=:0.2f} >? {ignore_posts_over_age_mins=:0.2f}")
+        logger.debug(
+            "time_since_post_mins=%0.2f >? ignore_posts_over_age_mins=%0.2f",
+            time_since_post_mins,
+            self._ignore_posts_over_age_mins,
+        )
         # The post is too old overall
-        if time_since_post > ignore_posts_over_age_mins:
-            return True
-        else:
-            return False
+        return time_since_post_mins > self._ignore_posts_over_age_mins
 
     def _post_needs_routine(self, post: Submission) -> bool:
         """Defines the criteria for whether a post needs a routine. Checks flair against the
@@ -747,99 +868,141 @@ class RoutineChecker(BotAction):
             bool: whether the post requires a routine (per the rules)
         """
 
-        # Flair
-        flair_to_check = self._params.flair_to_check
+        # Flair (a set lookup, so check it before looking at the post's content)
         post_flair = post.link_flair_text
-        logger.debug(f"Checking post flair {post_flair} in {flair_to_check}")
-        has_flair_requiring_routine = True if post_flair in flair_to_check else False
-        logger.debug(f"{has_flair_requiring_routine=}")
+        if post_flair not in self._flair_to_check:
+            return False
 
         # Image post
         image_post = post_is_an_image(post)
-        logger.debug(f"Is post an image? {image_post}")
-
-        if image_post and has_flair_requiring_routine:
-            return True
-        else:
-            return False
-
-    def _set_up_db(self, db: sqlite3.Cursor, db_table_name: str) -> sqlite3.Cursor:
+        logger.debug("Post %s has flair %s. Is post an image? %s", post.id, post_flair, image_post)
+        return image_post
+
+    @contextmanager
+    def _write_transaction(self) -> Iterator[None]:
+        """Run the enclosed database work in one transaction that takes the write lock up front
+        (BEGIN IMMEDIATE), so it can't fail partway through trying to upgrade a read lock. Commits
+        if the block succeeds and rolls back if it raises.
+        """
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            # Some errors (e.g. a full disk) make sqlite roll back on its own, and rolling back
+            # again would raise and hide the original error
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _set_up_db(self, db: sqlite3.Connection, db_table_name: str) -> sqlite3.Connection:
         """Create the database table in the given database, or not if it already exists."""
         try:
             logger.debug(f"Creating new table in db, {db_table_name}.")
             db.execute(
                 f"""CREATE TABLE {db_table_name}
-                    (id text, url text, created_utc int, needs_routine int, has_routine int,
-                    reminded_utc int, removed_utc int, reported_utc int, case_closed int)"""
+                    (id text PRIMARY KEY, url text, created_utc int, needs_routine int,
+                    has_routine int, reminded_utc int, removed_utc int, reported_utc int,
+                    case_closed int) WITHOUT ROWID"""
             )
         except sqlite3.OperationalError as e:
             # We don't want to overwrite the db every time we start the bot
             if "already exists" in str(e):
                 logger.debug("Database already exists, no need to initialize.")
+                # Tables made before id was the primary key need an index so lookups by id
+                # don't scan the whole table
+                db.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{db_table_name}_id ON {db_table_name} (id)"
+                )
             else:
                 logger.warning(f"Unknown OperationalError: {e}")
                 raise
         return db
 
-    def _update_db(self, db_post_state: PostState, post_state: PostState) -> None:
-        """Update individual fields in the database. There's probably a better way to do this,
-        but it works (was lifted from the old version mostly.)
+    def _check_query_plan(self) -> None:
+        """Log a warning if looking up posts by id would scan the whole table (i.e. the id index
+        is missing), since that gets slower as the database grows.
+        """
+        sql = "EXPLAIN QUERY PLAN " + self._SQL_SELECT_POSTS.format(placeholders="?")
+        plan = [row[-1] for row in self._db.execute(sql, ("",))]
+        logger.debug("Query plan for looking up posts: %s", plan)
+        if any(step.startswith("SCAN") for step in plan):
+            logger.warning(f"Looking up posts by id scans all of {self._DB_TABLE_NAME}: {plan}")
+
+    def _update_db(self, db_post_states: List[PostState], post_states: List[PostState]) -> None:
+        """Write the posts' states to the database, all with one executemany call. Posts whose
+        state didn't change are skipped.
 
         Args:
-            db_post_state (PostState): Prior database state (for comparison to know if it changed)
-            post_state (PostState): Post state with new information to update the db with
+            db_post_states (List[PostState]): Prior database state of each post (for comparison to
+                know if it changed)
+            post_states (List[PostState]): Post states with new information to update the db with,
+                in the same order
         """
-        update_table = f"UPDATE {self._DB_TABLE_NAME}"
-        where_id_is = f"WHERE id = '{post_state.post_id}'"
-        if (
-            post_state.needs_routine_per_requirements
-            != db_post_state.needs_routine_per_requirements
-        ):
-            db_cmd = f"{update_table} SET needs_routine = {int(post_state.needs_routine_per_requirements)} {where_id_is}"
-            logger.debug(db_cmd)
-            self._db.execute(db_cmd)
-        elif post_state.has_routine != db_post_state.has_routine:
-            db_cmd = (
-                f"{update_table} SET has_routine = {int(post_state.has_routine)} {where_id_is}"
+        rows = [
+            (
+                int(post_state.needs_routine_per_requirements),
+                int(post_state.has_routine),
+                post_state.reminded_utc,
+                post_state.removed_utc,
+                post_state.reported_utc,
+                int(post_state.stop_checking),
+                post_state.post_id,
             )
-            logger.debug(db_cmd)
-            self._db.execute(db_cmd)
-        elif post_state.reminded_utc != db_post_state.reminded_utc:
-            db_cmd = f"{update_table} SET reminded_utc = {post_state.reminded_utc} {where_id_is}"
-            logger.debug(db_cmd)
-            self._db.execute(db_cmd)
-        elif post_state.removed_utc != db_post_state.removed_utc:
-            db_cmd = f"{update_table} SET removed_utc = {post_state.removed_utc} {where_id_is}"
-            logger.debug(db_cmd)
-            self._db.execute(db_cmd)
-        elif post_state.reported_utc != db_post_state.reported_utc:
-            db_cmd = f"{update_table} SET reported_utc = {post_state.reported_utc} {where_id_is}"
-            logger.debug(db_cmd)
-            self._db.execute(db_cmd)
-
-    def _insert_db(self, post: Submission, post_state: PostState) -> None:
-        # TODO
-        row = (
-            post_state.post_id,
-            post.url,
-            post.created,
-            int(post_state.needs_routine_per_requirements),
-            int(post_state.has_routine),
-            post_state.reminded_utc,
-            post_state.removed_utc,
-            post_state.reported_utc,
-            int(post_state.stop_checking),
-        )
-        logger.debug(f"INSERTING row: {row=}")
-        self._db.execute(
-            f"""INSERT INTO {self._DB_TABLE_NAME}
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            row,
-        )
-        db_conn = self._db.connection
-        db_conn.commit()
+            for db_post_state, post_state in zip(db_post_states, post_states)
+            if post_state != db_post_state
+        ]
+        logger.debug("%s rows=%s", self._SQL_UPDATE_POST, rows)
+        self._db.executemany(self._SQL_UPDATE_POST, rows)
+
+    def _insert_db(self, posts: List[Submission], post_states: List[PostState]) -> None:
+        """Insert new posts into the database, all with one executemany call.
+
+        Args:
+            posts (List[Submission]): posts to insert
+            post_states (List[PostState]): initial state of each post, in the same order
+        """
+        rows = [
+            (
+                post_state.post_id,
+                post.url,
+                post.created,
+                int(post_state.needs_routine_per_requirements),
+                int(post_state.has_routine),
+                post_state.reminded_utc,
+                post_state.removed_utc,
+                post_state.reported_utc,
+                int(post_state.stop_checking),
+            )
+            for post, post_state in zip(posts, post_states)
+        ]
+        logger.debug("INSERTING rows: rows=%s", rows)
+        self._db.executemany(self._SQL_INSERT_POST, rows)
+
+    def _get_op_text(
+        self, post: Submission, op_text_by_post_id: Optional[Dict[str, List[str]]]
+    ) -> List[str]:
+        """Get the stripped text of the post body and OP's comments, reusing it if it was already
+        fetched this run.
 
-    def _post_meets_requirements(self, post: Submission) -> Tuple[bool, Optional[RoutineErrors]]:
+        Args:
+            post (Submission): post to get OP's text for
+            op_text_by_post_id (Optional[Dict[str, List[str]]]): OP's text for posts already
+                fetched this run, keyed by post id. The post's text is added to it if it has to be
+                fetched. If None, the text is always fetched.
+
+        Returns:
+            List[str]: stripped post body, followed by the stripped text of each of OP's comments
+        """
+        if op_text_by_post_id is None:
+            return get_all_op_text(post)
+        if post.id not in op_text_by_post_id:
+            op_text_by_post_id[post.id] = get_all_op_text(post)
+        return op_text_by_post_id[post.id]
+
+    def _post_meets_requirements(
+        self, post: Submission, op_text_by_post_id: Optional[Dict[str, List[str]]] = None
+    ) -> Tuple[bool, Optional[RoutineErrors]]:
         """Check whether the post meets all the requirements - having a routine, and not cheating
         (including cheater phrases or being too short). Looks through all the comments from OP and
         any body text from the post itself. Returns True for the first comment or post that meets
@@ -850,27 +1013,37 @@ class RoutineChecker(BotAction):
 
         Args:
             post (Submission): post to check
+            op_text_by_post_id (Optional[Dict[str, List[str]]], optional): OP's text for posts
+                already fetched this run, keyed by post id. The post's text is added to it if it
+                has to be fetched. Defaults to None (always fetch).
 
         Returns:
             Tuple[bool, Optional[RoutineErrors]]: whether the post meets reqs, and any issues
                 that the post has (too short, avoids routine)
         """
-        op_text = get_all_op_text(post)
+        op_text = self._get_op_text(post, op_text_by_post_id)
         best_so_far = RoutineErrors(avoiding_routine=None, too_short=None, comment=None)
+        # Most posts that get here have no routine at all, so scan everything OP wrote in one go
+        # before checking comments individually. Keywords don't contain the separator, so a match
+        # can't span two comments.
+        if not self._text_has_routine(TEXT_SEPARATOR.join(op_text)):
+            return False, best_so_far
         for comment in op_text:
-            # Evaluate all the requirements
-            has_kwd = self._text_has_routine(comment)
+            # Comments without a keyword don't count at all, so skip the other checks for them
+            if not self._text_has_routine(comment):
+                continue
             has_min_length = self._text_fulfills_min_length(comment)
             avoiding_routine = self._text_has_sidesteppers(comment)
 
             # See if the comment meets the requirements
-            if has_kwd and has_min_length and not avoiding_routine:  # Meets all requirements
+            if has_min_length and not avoiding_routine:  # Meets all requirements
                 return True, None
-            elif has_kwd:  # Has a routine but is missing something
-                err = RoutineErrors(
-                    avoiding_routine=avoiding_routine, too_short=~has_min_length, comment=comment
-                )
-                best_so_far = err if err.is_better_than(best_so_far) else best_so_far
+            # Has a routine but is missing something
+            err = RoutineErrors(
+                avoiding_routine=avoiding_routine, too_short=not has_min_length, comment=comment
+            )
+            if err.is_better_than(best_so_far):
+                best_so_far = err
         return False, best_so_far
 
     def _text_has_routine(self, text: str) -> bool:
@@ -883,10 +1056,7 @@ class RoutineChecker(BotAction):
         Returns:
             bool: whether the text has any of the keywords
         """
-        for k in self._params.keywords:
-            if k in text:
-                return True
-        return False
+        return self._keyword_pattern.search(text) is not None
 
     def _text_fulfills_min_length(self, text: str) -> bool:
         """Whether the text fulfills the minimum character count, if there is one.
@@ -898,13 +1068,7 @@ class RoutineChecker(BotAction):
         Returns:
             bool: whether the text is longer than the minimum.
         """
-        if (
-            self._params.min_routine_characters > 0
-            and self._params.min_routine_characters is not None
-        ):
-            return len(text) >= self._params.min_routine_characters
-        else:
-            return True
+        return len(text) >= self._min_routine_characters
 
     def _text_has_sidesteppers(self, text: str) -> bool:
         """Whether the given text has any phrases that indicate that they're avoiding writing their
@@ -917,7 +1081,4 @@ class RoutineChecker(BotAction):
         Returns:
             bool: whether the text has any of the sidestepper keywords
         """
-        for cheat in self._params.sidestepping_phrases:
-            if cheat in text:
-                return True
-        return False
+        return self._sidestepper_pattern.search(text) is not None
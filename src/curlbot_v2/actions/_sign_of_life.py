@@ -25,18 +25,19 @@ class SignOfLife(BotAction):
     _params: SignOfLifeParams
     _subreddit: Subreddit
     _subreddit_url: str
+    _post: Submission
 
     def __init__(
         self,
         subreddit: Subreddit,
-        db: Optional[sqlite3.Cursor] = None,
+        db: Optional[sqlite3.Connection] = None,
     ) -> None:
         """Updates an indicator that the bot is up and running.
 
         Args:
             subreddit (Subreddit): Instantiated & authenticated subreddit object. (Note: you can get the reddit object
                 from this if needed)
-            db (sqlite3.Cursor): In this case, no database is needed, so pass in None. If one is given, it won't be
+            db (sqlite3.Connection): In this case, no database is needed, so pass in None. If one is given, it won't be
                 used.
         """
         self._subreddit = subreddit
@@ -44,6 +45,8 @@ class SignOfLife(BotAction):
         self._subreddit_url = f"https://www.reddit.com/r/{self._subreddit.display_name}"
         self._bot_username = self._subreddit._reddit.user.me().name
         self._verify_subreddit_is_self()
+        # Reuse the same (lazy) post object for every edit rather than making a new one each run
+        self._post = self._subreddit._reddit.submission(id=self._params.post_id)
         self._send_sign_of_life()  # Send an initial sign upon startup
 
     def run(self) -> None:
@@ -84,9 +87,7 @@ class SignOfLife(BotAction):
         west_coast_timezone = pytz.timezone("America/Los_Angeles")
         timestamp = datetime.datetime.now(west_coast_timezone).strftime("%Y-%m-%d %H:%M")
         message = f"Bot last online: {timestamp} (Pacific time).\n\nUpdates ~hourly."
-        logger.debug(f"The message will be: {message}")
-        logger.debug(f"{vars(self._subreddit.mod)=}")
+        logger.debug("The message will be: %s", message)
 
         # Rewrite the post body to contain the message
-        post: Submission = self._subreddit._reddit.submission(id=self._params.post_id)
-        post.edit(message)
+        self._post.edit(message)
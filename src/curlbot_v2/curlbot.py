@@ -1,4 +1,5 @@
 import logging
+import os
 import sqlite3
 import time
 from logging.handlers import RotatingFileHandler
@@ -9,14 +10,14 @@ import schedule
 
 from curlbot_v2.actions import BotAction, RoutineChecker, SignOfLife
 
-logger = logging.getLogger()
+logger = logging.getLogger(__name__)
 
 
 class CurlBot:
     _praw_ini_site_name: str
     _jobs: Dict[str, schedule.Job]
     _reddit: praw.Reddit
-    _db: sqlite3.Cursor
+    _db: sqlite3.Connection
 
     def __init__(self, praw_ini_site_name: str, database_name: str) -> None:
         """Initialize curlbot to set up reddit using the specified ini file and database name.
@@ -30,10 +31,23 @@ class CurlBot:
         self._db = self._initialize_database(database_name)
         self._jobs = {}
 
-    def _initialize_database(self, db_name: str) -> sqlite3.Cursor:
-        db_conn = sqlite3.connect(db_name)
-        db = db_conn.cursor()
-        return db
+    def _initialize_database(self, db_name: str) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly by the actions that need them
+        db_conn = sqlite3.connect(db_name, isolation_level=None)
+        # Keep ~20MB of pages in memory (negative values are in KiB) so lookups of recent posts
+        # don't have to go back to disk
+        db_conn.execute("PRAGMA cache_size = -20000")
+        # Write-ahead logging lets a transaction commit without syncing the whole database file,
+        # and NORMAL sync is still safe against corruption in WAL mode
+        db_conn.execute("PRAGMA journal_mode = WAL")
+        db_conn.execute("PRAGMA synchronous = NORMAL")
+        # Keep temporary tables/indices in memory, and read the database file through a memory map
+        # (up to 256MB) instead of copying pages in with read() calls
+        db_conn.execute("PRAGMA temp_store = MEMORY")
+        db_conn.execute("PRAGMA mmap_size = 268435456")
+        # The connection itself is shared with the bot actions; they run statements on it directly
+        # (which makes a cursor per statement) rather than sharing one cursor
+        return db_conn
 
     def get_subreddit(self, subreddit_name: str) -> praw.reddit.Subreddit:
         return self._reddit.subreddit(subreddit_name)
@@ -65,10 +79,30 @@ class CurlBot:
 
 class CustomModuleFilter(logging.Filter):
     def __init__(self, module_name):
+        super().__init__()
         self.module_name = module_name
+        # This runs for every log record (including PRAW's), so only build the path once
+        self._path_fragment = f"/src/{module_name}"
 
     def filter(self, record):
-        return f"/src/{self.module_name}" in record.pathname
+        return self._path_fragment in record.pathname
+
+
+def get_sleep_secs(max_sleep_secs: float = 60) -> float:
+    """How long the main loop can sleep before the next scheduled job is due, so it doesn't wake up
+    when there's nothing to do.
+
+    Args:
+        max_sleep_secs (float, optional): Never sleep longer than this, even if the next job is
+            further away (or there are no jobs). Defaults to 60.
+
+    Returns:
+        float: number of seconds to sleep
+    """
+    idle_secs = schedule.idle_seconds()
+    if idle_secs is None:  # No jobs scheduled
+        return max_sleep_secs
+    return min(max(idle_secs, 0), max_sleep_secs)
 
 
 def run():
@@ -79,9 +113,11 @@ def run():
     )
     handler.setFormatter(formatter)
     handler.addFilter(CustomModuleFilter("curlbot_v2"))
-    logger = logging.getLogger()
-    logger.addHandler(handler)
-    logger.setLevel(logging.DEBUG)
+    logging.getLogger().addHandler(handler)
+    # Only turn on debug logging for the bot itself. Setting it on the root logger makes PRAW and
+    # urllib3 build a record (walking the stack for the line number) for every request, just for
+    # the filter above to throw it away.
+    logging.getLogger("curlbot_v2").setLevel(os.environ.get("CURLBOT_LOG_LEVEL", "DEBUG").upper())
 
     schedule.clear()
 
@@ -121,5 +157,6 @@ def run():
             logger.error("Threw an error!!!")
             logger.error(e, exc_info=True)
             raise e
-        logger.debug("Schedule sleeping.")
-        time.sleep(10)
+        sleep_secs = get_sleep_secs()
+        logger.debug("Schedule sleeping for %0.1f seconds.", sleep_secs)
+        time.sleep(sleep_secs)
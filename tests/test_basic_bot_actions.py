@@ -51,6 +51,19 @@ class TestRedditBotConfig(unittest.TestCase):
         self.assertEqual(config["settings"]["option1"], True)
         self.assertEqual(config["settings"]["option2"], False)
 
+    def test_config_reused_for_same_content(self):
+        wiki_page = self.mock_reddit.subreddit().wiki.__getitem__()
+        wiki_page.content_md = "bot_name: MyBot"
+
+        bot_action = DummyBotAction(self.mock_reddit, "subreddit_name")
+        config = bot_action._get_config_from_wiki("wiki_page_name")
+        self.assertIs(bot_action._get_config_from_wiki("wiki_page_name"), config)
+
+        # An edit to the page gets parsed again
+        wiki_page.content_md = "bot_name: MyNewBot"
+        config = bot_action._get_config_from_wiki("wiki_page_name")
+        self.assertEqual(config["bot_name"], "MyNewBot")
+
     def test_missing_wiki_page(self):
         # Simulate a missing wiki page
         response = requests.Response()
@@ -0,0 +1,28 @@
+import logging
+
+import schedule
+
+from curlbot_v2.curlbot import CustomModuleFilter, get_sleep_secs
+
+
+def test_get_sleep_secs_no_jobs():
+    schedule.clear()
+    assert get_sleep_secs(max_sleep_secs=60) == 60
+
+
+def test_get_sleep_secs_until_next_job():
+    schedule.clear()
+    schedule.every(30).seconds.do(lambda: None)
+    assert 29 <= get_sleep_secs(max_sleep_secs=60) <= 30
+    assert get_sleep_secs(max_sleep_secs=10) == 10
+    schedule.clear()
+
+
+def test_custom_module_filter():
+    module_filter = CustomModuleFilter("curlbot_v2")
+
+    def make_record(pathname):
+        return logging.LogRecord("name", logging.INFO, pathname, 1, "msg", None, None)
+
+    assert module_filter.filter(make_record("/home/bot/src/curlbot_v2/curlbot.py"))
+    assert not module_filter.filter(make_record("/usr/lib/python3/site-packages/praw/reddit.py"))
@@ -1,5 +1,8 @@
 import datetime
 import logging
+import sqlite3
+import time
+from dataclasses import replace
 from unittest.mock import MagicMock, patch
 
 import praw
@@ -94,6 +97,85 @@ class TestRoutineChecker:
         caplog.set_level(logging.DEBUG)
         print(routine_checker._subreddit)
 
+    def test_invalid_config_raises(self, routine_checker: RoutineChecker):
+        config = {
+            "flair_to_check": ["not a flair"],
+            "remind_after_mins": "10",
+            "remove_after_mins": 60,
+            "report_after_mins": 60,
+            "keywords": ["routine"],
+            "min_routine_characters": 25,
+            "sidestepping_phrases": ["no routine"],
+            "max_posts": 100,
+            "reminder_messages_by_flair": {},
+        }
+        with pytest.raises(ValueError) as e:
+            routine_checker._validate_config(config)
+        assert "remind_after_mins" in str(e.value)
+        assert "not a flair" in str(e.value)
+
+        del config["max_posts"]
+        with pytest.raises(ValueError, match="max_posts"):
+            routine_checker._validate_config(config)
+
+    def test_params_not_reloaded_within_ttl(
+        self, routine_checker: RoutineChecker, mock_subreddit: MagicMock
+    ):
+        mock_subreddit.wiki.__getitem__.reset_mock()
+        routine_checker._reload_params()
+        mock_subreddit.wiki.__getitem__.assert_not_called()
+
+    def test_params_reloaded_after_ttl(
+        self, routine_checker: RoutineChecker, mock_subreddit: MagicMock
+    ):
+        wiki_page = mock_subreddit.wiki.__getitem__()
+        wiki_page.content_md = wiki_page.content_md.replace("max_posts: 100", "max_posts: 50")
+        routine_checker._params_checked_at -= routine_checker._CONFIG_TTL_SECS
+        routine_checker._reload_params()
+        assert routine_checker._params.max_posts == 50
+
+    def test_rejected_params_retried_once_flair_exists(
+        self, routine_checker: RoutineChecker, mock_subreddit: MagicMock
+    ):
+        # Mods add the config for a new flair before the bot has seen the flair itself
+        wiki_page = mock_subreddit.wiki.__getitem__()
+        wiki_page.content_md = wiki_page.content_md.replace(
+            'flair_to_check: ["help"]', 'flair_to_check: ["help", "new"]'
+        ).replace('{"help": "temp",}', '{"help": "temp", "new": "temp"}')
+        mock_subreddit.flair.link_templates = [
+            {"type": "LINK_FLAIR", "text": "help"},
+            {"type": "LINK_FLAIR", "text": "new"},
+        ]
+        routine_checker._params_checked_at -= routine_checker._CONFIG_TTL_SECS
+        routine_checker._reload_params()
+        assert routine_checker._params.flair_to_check == ["help"]
+
+        # Once both caches expire, the same page is validated again against the new flairs
+        checked_at, flairs = routine_checker._valid_link_flairs
+        routine_checker._valid_link_flairs = (
+            checked_at - routine_checker._FLAIR_TTL_SECS - 1,
+            flairs,
+        )
+        routine_checker._params_checked_at -= routine_checker._CONFIG_TTL_SECS
+        routine_checker._reload_params()
+        assert routine_checker._params.flair_to_check == ["help", "new"]
+        assert routine_checker._flair_to_check == frozenset(["help", "new"])
+
+    def test_link_flairs_cached(self, routine_checker: RoutineChecker, mock_subreddit: MagicMock):
+        # The flairs were already listed while validating the config in __init__, so changing
+        # them on reddit doesn't affect validating again
+        mock_subreddit.flair.link_templates = [{"type": "LINK_FLAIR", "text": "other"}]
+        routine_checker._validate_config(vars(routine_checker._params))
+        assert routine_checker._get_valid_link_flairs() == frozenset(["help"])
+
+        # Until they're too old to trust
+        checked_at, flairs = routine_checker._valid_link_flairs
+        routine_checker._valid_link_flairs = (
+            checked_at - routine_checker._FLAIR_TTL_SECS - 1,
+            flairs,
+        )
+        assert routine_checker._get_valid_link_flairs() == frozenset(["other"])
+
     def test_post_needs_routine_with_flair(
         self,
         caplog: LogCaptureFixture,
@@ -109,6 +191,66 @@ class TestRoutineChecker:
         mock_submission.link_flair_text = "Other Flair"
         assert not routine_checker._post_needs_routine(mock_submission)
 
+    def test_post_is_over_time_limit(self, routine_checker: RoutineChecker):
+        limit_mins = routine_checker._params.ignore_posts_over_age_hours * 60
+        assert not routine_checker._post_is_over_time_limit(limit_mins - 1)
+        assert routine_checker._post_is_over_time_limit(limit_mins + 1)
+
+    @patch("curlbot_v2.actions._routine_checker.get_all_op_text")
+    def test_post_meets_requirements(
+        self, mock_get_all_op_text: MagicMock, routine_checker: RoutineChecker
+    ):
+        mock_get_all_op_text.return_value = ["nice curls", "my routine is to plop and air dry"]
+        assert routine_checker._post_meets_requirements(MagicMock()) == (True, None)
+
+    @patch("curlbot_v2.actions._routine_checker.get_all_op_text")
+    def test_post_meets_requirements_too_short(
+        self, mock_get_all_op_text: MagicMock, routine_checker: RoutineChecker
+    ):
+        mock_get_all_op_text.return_value = ["nice curls", "i plop", "no routine but i plop daily"]
+        meets_reqs, errors = routine_checker._post_meets_requirements(MagicMock())
+        assert not meets_reqs
+        assert errors.comment == "i plop"
+        assert errors.too_short
+        assert not errors.avoiding_routine
+
+    @patch("curlbot_v2.actions._routine_checker.get_all_op_text")
+    def test_post_meets_requirements_no_keywords(
+        self, mock_get_all_op_text: MagicMock, routine_checker: RoutineChecker
+    ):
+        mock_get_all_op_text.return_value = ["nice curls", "thanks everyone"]
+        meets_reqs, errors = routine_checker._post_meets_requirements(MagicMock())
+        assert not meets_reqs
+        assert errors.comment is None
+
+    def test_text_has_routine(self, routine_checker: RoutineChecker):
+        assert routine_checker._text_has_routine("my routine is to plop and air dry")
+        assert routine_checker._text_has_routine("s2c")
+        # Keywords are matched the same way OP's text is normalized (lowercase, no punctuation)
+        assert routine_checker._text_has_routine("i used curl cream")
+        assert not routine_checker._text_has_routine("what products should i use")
+
+    def test_punctuation_only_phrases_are_ignored(
+        self, routine_checker: RoutineChecker, mock_subreddit: MagicMock
+    ):
+        wiki_page = mock_subreddit.wiki.__getitem__()
+        wiki_page.content_md = wiki_page.content_md.replace(
+            '"condition with"]', '"condition with", "?!"]'
+        )
+        routine_checker._params_checked_at -= routine_checker._CONFIG_TTL_SECS
+        routine_checker._reload_params()
+        assert "?!" in routine_checker._params.keywords
+        assert not routine_checker._text_has_routine("thanks all")
+        assert routine_checker._text_has_routine("my routine")
+
+    def test_text_fulfills_min_length(self, routine_checker: RoutineChecker):
+        assert routine_checker._text_fulfills_min_length("x" * 25)
+        assert not routine_checker._text_fulfills_min_length("x" * 24)
+
+    def test_text_has_sidesteppers(self, routine_checker: RoutineChecker):
+        assert routine_checker._text_has_sidesteppers("i dont have a routine yet")
+        assert not routine_checker._text_has_sidesteppers("my routine is below")
+
     # def test_time_elapsed_since_post(self):
     #     mock_submission = MagicMock(created_utc=1000)
     #     current_time = 2000
@@ -285,7 +427,7 @@ class TestRoutineChecker:
         mock_utcnow = MagicMock()
         monkeypatch.setattr(datetime, "datetime", mock_utcnow)
         mock_utcnow.utcnow.return_value = datetime.datetime(2023, 8, 28, 1, 40, 27, 776743)
-        post = MagicMock(created_utc=1693211427)
+        post = MagicMock(created_utc=1693211427, selftext="")
 
         # Call _remind_report_remove, which should only modify things related to reminding
         updated_post_state = routine_checker._remind_remove_report(post, post_state)
@@ -344,7 +486,7 @@ class TestRoutineChecker:
         mock_utcnow = MagicMock()
         monkeypatch.setattr(datetime, "datetime", mock_utcnow)
         mock_utcnow.utcnow.return_value = datetime.datetime(2023, 8, 28, 1, 40, 27, 776743)
-        post = MagicMock(created_utc=1693211427)
+        post = MagicMock(created_utc=1693211427, selftext="")
 
         # Call _remind_report_remove, which should only modify things related to reminding
         updated_post_state = routine_checker._remind_remove_report(post, post_state)
@@ -379,7 +521,7 @@ class TestRoutineChecker:
         mock_utcnow = MagicMock()
         monkeypatch.setattr(datetime, "datetime", mock_utcnow)
         mock_utcnow.utcnow.return_value = datetime.datetime(2023, 8, 28, 1, 40, 27, 776743)
-        post = MagicMock(created_utc=1693211427)
+        post = MagicMock(created_utc=1693211427, selftext="")
 
         # Call _remind_report_remove, which should only modify things related to reminding
         updated_post_state = routine_checker._remind_remove_report(post, post_state)
@@ -444,6 +586,248 @@ class TestRoutineChecker:
 
     # TODO test case where stop_checking is True (doesn't matter what other params are set)
 
+    @patch("curlbot_v2.actions._routine_checker.time_elapsed_since_post", return_value=24 * 60)
+    def test__remind_report_remove_too_old(self, _, routine_checker: RoutineChecker):
+        post = MagicMock(created_utc=1693211427)
+        post_state = PostState(
+            post_id="123",
+            post_in_database=True,
+            needs_routine_per_requirements=True,
+            has_routine=False,
+            stop_checking=False,
+            reminded_utc=-1,
+            removed_utc=-1,
+            reported_utc=-1,
+        )
+
+        updated_post_state = routine_checker._remind_remove_report(post, post_state)
+
+        assert updated_post_state == replace(post_state, stop_checking=True)
+        assert not post.reply.called
+        assert not post.report.called
+        assert not post.mod.remove.called
+
+
+class TestRoutineCheckerDatabase:
+    _LEGACY_TABLE_SQL = (
+        "CREATE TABLE post_history (id text, url text, created_utc int, needs_routine int, "
+        "has_routine int, reminded_utc int, removed_utc int, reported_utc int, case_closed int)"
+    )
+
+    @pytest.fixture
+    def mock_subreddit(self):
+        subreddit = MagicMock()
+        subreddit.flair.link_templates = [{"type": "LINK_FLAIR", "text": "help"}]
+        subreddit.wiki.__getitem__().content_md = """
+        flair_to_check: ["help"]
+        remind_after_mins: 10
+        remove_after_mins: 60
+        report_after_mins: 60
+        keywords: ["routine"]
+        min_routine_characters: 25
+        sidestepping_phrases: ["no routine"]
+        max_posts: 100
+        reminder_messages_by_flair: {"help": "temp",}
+        """
+        return subreddit
+
+    @pytest.fixture
+    def db(self):
+        db_conn = sqlite3.connect(":memory:", isolation_level=None)
+        yield db_conn
+        db_conn.close()
+
+    @pytest.fixture
+    def routine_checker(self, mock_subreddit: MagicMock, db: sqlite3.Connection):
+        return RoutineChecker(mock_subreddit, db)
+
+    def test_new_post_is_inserted(self, routine_checker: RoutineChecker):
+        post = MagicMock(id="abc", url="dummy_url.jpg", created=1693211427)
+        post_state = routine_checker._get_post_state_from_database(post)
+        assert not post_state.post_in_database
+
+        post_state = routine_checker._get_post_state_from_database(post)
+        assert post_state.post_in_database
+        assert post_state.reminded_utc == -1
+        assert not post_state.stop_checking
+
+    def test_bulk_lookup_keeps_post_order(self, routine_checker: RoutineChecker):
+        old_post = MagicMock(id="old", url="dummy_url.jpg", created=1693211427)
+        new_post = MagicMock(id="new", url="dummy_url.jpg", created=1693211428)
+        routine_checker._get_post_state_from_database(old_post)
+
+        post_states = routine_checker._get_post_states_from_database([new_post, old_post])
+        assert [post_state.post_id for post_state in post_states] == ["new", "old"]
+        assert not post_states[0].post_in_database
+        assert post_states[1].post_in_database
+
+    def test_existing_table_gets_id_index(self, mock_subreddit: MagicMock, db: sqlite3.Connection):
+        db.execute(self._LEGACY_TABLE_SQL)
+        RoutineChecker(mock_subreddit, db)
+        indexes = db.execute("PRAGMA index_list(post_history)").fetchall()
+        assert [index[1] for index in indexes] == ["idx_post_history_id"]
+
+    def test_query_plan_uses_index(
+        self, caplog: LogCaptureFixture, routine_checker: RoutineChecker
+    ):
+        routine_checker._check_query_plan()
+        assert "scans all" not in caplog.text
+
+    def test_query_plan_checked_without_debug_logging(
+        self, caplog: LogCaptureFixture, mock_subreddit: MagicMock, db: sqlite3.Connection
+    ):
+        caplog.set_level(logging.INFO, logger="curlbot_v2")
+        with patch.object(RoutineChecker, "_check_query_plan") as mock_check_query_plan:
+            RoutineChecker(mock_subreddit, db)
+        mock_check_query_plan.assert_called_once()
+
+    def test_query_plan_without_index_warns(
+        self, caplog: LogCaptureFixture, mock_subreddit: MagicMock, db: sqlite3.Connection
+    ):
+        db.execute(self._LEGACY_TABLE_SQL)
+        # Skip the check in __init__, otherwise sqlite reuses that (indexed) plan below
+        with patch.object(RoutineChecker, "_check_query_plan"):
+            routine_checker = RoutineChecker(mock_subreddit, db)
+        db.execute("DROP INDEX idx_post_history_id")
+        routine_checker._check_query_plan()
+        assert "scans all" in caplog.text
+
+    def test_duplicate_rows_raise(self, mock_subreddit: MagicMock, db: sqlite3.Connection):
+        # Only tables made before id was the primary key can have duplicates
+        db.execute(self._LEGACY_TABLE_SQL)
+        routine_checker = RoutineChecker(mock_subreddit, db)
+        post = MagicMock(id="abc", url="dummy_url.jpg", created=1693211427)
+        routine_checker._get_post_state_from_database(post)
+        db.execute("INSERT INTO post_history SELECT * FROM post_history")
+        with pytest.raises(ValueError):
+            routine_checker._get_post_state_from_database(post)
+
+    def test_run_skips_old_and_unchecked_flair_posts(
+        self, routine_checker: RoutineChecker, db: sqlite3.Connection
+    ):
+        now = time.time()
+        day_ago = now - 24 * 60 * 60
+        posts = [
+            MagicMock(
+                id="text", url="a.html", created=now, created_utc=now, link_flair_text="help"
+            ),
+            MagicMock(
+                id="old", url="a.jpg", created=day_ago, created_utc=day_ago, link_flair_text="help"
+            ),
+            MagicMock(id="flair", url="a.jpg", created=now, created_utc=now, link_flair_text="x"),
+        ]
+        with patch(
+            "curlbot_v2.actions._routine_checker.get_new_subreddit_posts", return_value=posts
+        ):
+            routine_checker.run()
+        assert db.execute("SELECT id, case_closed FROM post_history").fetchall() == [("text", 1)]
+
+    @patch("curlbot_v2.actions._routine_checker.get_all_op_text", return_value=[])
+    @patch("curlbot_v2.actions._routine_checker.add_sticky_comment")
+    def test_run_saves_actions_taken_before_an_error(
+        self,
+        mock_add_sticky_comment: MagicMock,
+        _,
+        routine_checker: RoutineChecker,
+        db: sqlite3.Connection,
+    ):
+        created = time.time() - 20 * 60  # Due for a reminder, but not removal
+        posts = [
+            MagicMock(
+                id=post_id,
+                url="a.jpg",
+                created=created,
+                created_utc=created,
+                link_flair_text="help",
+            )
+            for post_id in ("first", "second")
+        ]
+        mock_add_sticky_comment.side_effect = [None, RuntimeError("reddit is down")]
+        with patch(
+            "curlbot_v2.actions._routine_checker.get_new_subreddit_posts", return_value=posts
+        ):
+            with pytest.raises(RuntimeError):
+                routine_checker.run()
+
+        # The first post was reminded, so that has to be saved even though the run failed
+        reminded = dict(db.execute("SELECT id, reminded_utc FROM post_history").fetchall())
+        assert reminded["first"] > 0
+        assert reminded["second"] == -1
+        assert not db.in_transaction
+
+    @patch("curlbot_v2.actions._routine_checker.get_all_op_text", return_value=[])
+    def test_run_fetches_op_text_once_per_post(
+        self, mock_get_all_op_text: MagicMock, routine_checker: RoutineChecker
+    ):
+        created = time.time() - 61 * 60  # Due for a report, which reads OP's text again
+        post = MagicMock(
+            id="abc", url="a.jpg", created=created, created_utc=created, link_flair_text="help"
+        )
+        with patch(
+            "curlbot_v2.actions._routine_checker.get_new_subreddit_posts", return_value=[post]
+        ):
+            routine_checker.run()
+        post.report.assert_called()
+        mock_get_all_op_text.assert_called_once_with(post)
+
+    def test_write_transaction_commits(
+        self, routine_checker: RoutineChecker, db: sqlite3.Connection
+    ):
+        post = MagicMock(id="abc", url="dummy_url.jpg", created=1693211427)
+        with routine_checker._write_transaction():
+            routine_checker._get_post_state_from_database(post)
+        assert not db.in_transaction
+        assert db.execute("SELECT COUNT(*) FROM post_history").fetchone() == (1,)
+
+    def test_write_transaction_rolls_back(
+        self, routine_checker: RoutineChecker, db: sqlite3.Connection
+    ):
+        post = MagicMock(id="abc", url="dummy_url.jpg", created=1693211427)
+        with pytest.raises(RuntimeError):
+            with routine_checker._write_transaction():
+                routine_checker._get_post_state_from_database(post)
+                raise RuntimeError()
+        assert not db.in_transaction
+        assert db.execute("SELECT COUNT(*) FROM post_history").fetchone() == (0,)
+
+    def test_write_transaction_keeps_error_after_sqlite_rolls_back(
+        self, routine_checker: RoutineChecker, db: sqlite3.Connection
+    ):
+        with pytest.raises(RuntimeError, match="original error"):
+            with routine_checker._write_transaction():
+                # Stand-in for sqlite ending the transaction itself before the error reaches us
+                db.execute("ROLLBACK")
+                raise RuntimeError("original error")
+        assert not db.in_transaction
+
+    def test_update_is_persisted(self, routine_checker: RoutineChecker):
+        post = MagicMock(id="abc", url="dummy_url.jpg", created=1693211427)
+        post_state = routine_checker._get_post_state_from_database(post)
+        new_post_state = PostState(
+            post_id="abc",
+            post_in_database=False,
+            needs_routine_per_requirements=False,
+            has_routine=False,
+            stop_checking=False,
+            reminded_utc=123,
+            removed_utc=-1,
+            reported_utc=-1,
+        )
+        routine_checker._update_db([post_state], [new_post_state])
+
+        assert routine_checker._get_post_state_from_database(post).reminded_utc == 123
+
+    def test_multiple_field_update_is_persisted(self, routine_checker: RoutineChecker):
+        post = MagicMock(id="abc", url="dummy_url.jpg", created=1693211427)
+        post_state = routine_checker._get_post_state_from_database(post)
+        new_post_state = replace(post_state, has_routine=True, stop_checking=True)
+        routine_checker._update_db([post_state], [new_post_state])
+
+        db_post_state = routine_checker._get_post_state_from_database(post)
+        assert db_post_state.has_routine
+        assert db_post_state.stop_checking
+        assert not post_state.has_routine
+
 
 class TestRoutineErrors:
     def test_is_better_than(self):
@@ -468,3 +852,7 @@ class TestRoutineErrors:
         assert not RoutineErrors(
             comment="comment", avoiding_routine=True, too_short=True
         ).is_better_than(RoutineErrors(comment="comment", avoiding_routine=True, too_short=False))
+        # Neither has a comment
+        assert not RoutineErrors(
+            comment=None, avoiding_routine=None, too_short=None
+        ).is_better_than(RoutineErrors(comment=None, avoiding_routine=None, too_short=None))
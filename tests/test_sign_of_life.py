@@ -51,3 +51,12 @@ class TestSignOfLife:
         # Initialize SignOfLife with the mock subreddit
         with pytest.raises(ValueError):
             SignOfLife(mock_subreddit_nonself, None)
+
+    def test_sign_of_life_reuses_post(self):
+        subreddit = MagicMock(display_name="u_CurlyBot")
+        subreddit._reddit.user.me().name = "CurlyBot"
+        action = SignOfLife(subreddit, None)
+        action.run()
+
+        subreddit._reddit.submission.assert_called_once_with(id=action._params.post_id)
+        assert subreddit._reddit.submission().edit.call_count == 2
@@ -1,14 +1,19 @@
 import datetime
 import logging
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+
+import pytest
+from prawcore.exceptions import RequestException, TooManyRequests
 
 from curlbot_v2._submission_helpers import (
     add_sticky_comment,
+    get_all_op_text,
     get_new_subreddit_posts,
     get_op_comments,
     get_post_body,
     post_is_an_image,
     strip_text,
+    strip_texts,
     time_elapsed_since_post,
 )
 
@@ -29,11 +34,23 @@ def test_get_op_comments():
     post = MagicMock()
     comment1 = MagicMock(is_submitter=True)
     comment2 = MagicMock(is_submitter=False)
-    post.comments = [comment1, comment2]
+    post.comments.list.return_value = [comment1, comment2]
 
     op_comments = get_op_comments(post)
     assert len(op_comments) == 1
     assert op_comments[0] == comment1
+    # "Load more comments" stubs are dropped, not fetched
+    post.comments.replace_more.assert_called_once_with(limit=0)
+
+
+# Test get_all_op_text
+def test_get_all_op_text():
+    post = MagicMock(selftext="My Routine:")
+    comment1 = MagicMock(is_submitter=True, body="Shampoo, then condition!")
+    comment2 = MagicMock(is_submitter=False, body="Nice curls!")
+    post.comments.list.return_value = [comment1, comment2]
+
+    assert get_all_op_text(post) == ["my routine", "shampoo then condition"]
 
 
 # Test get_new_subreddit_posts
@@ -49,11 +66,55 @@ def test_get_new_subreddit_posts(monkeypatch):
     assert posts[1] == post2
 
 
+# Test get_new_subreddit_posts retries transient errors with a growing wait
+@patch("curlbot_v2._submission_helpers.time.sleep")
+def test_get_new_subreddit_posts_retries_with_backoff(mock_sleep):
+    subreddit = MagicMock()
+    post = MagicMock()
+    error = RequestException(Exception("connection reset"), (), {})
+    subreddit.new.side_effect = [error, error, [post]]
+
+    posts = get_new_subreddit_posts(subreddit, max_posts=1, max_attempts=3, backoff_secs=2.0)
+    assert posts == [post]
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [2.0, 4.0]
+
+
+@patch("curlbot_v2._submission_helpers.time.sleep")
+def test_get_new_subreddit_posts_gives_up(mock_sleep):
+    subreddit = MagicMock()
+    subreddit.new.side_effect = RequestException(Exception("connection reset"), (), {})
+
+    with pytest.raises(RequestException):
+        get_new_subreddit_posts(subreddit, max_posts=1, max_attempts=2)
+    assert mock_sleep.call_count == 1
+
+
+@patch("curlbot_v2._submission_helpers.time.sleep")
+def test_get_new_subreddit_posts_respects_rate_limit(mock_sleep):
+    subreddit = MagicMock()
+    response = MagicMock(status_code=429, headers={"x-ratelimit-reset": "30"})
+    subreddit.new.side_effect = [TooManyRequests(response), []]
+
+    get_new_subreddit_posts(subreddit, max_posts=1, backoff_secs=2.0)
+    mock_sleep.assert_called_once_with(30.0)
+
+
 # Test strip_text
 def test_strip_text():
     text = "Hello, World! How's it going?"
     stripped_text = strip_text(text)
     assert stripped_text == "hello world hows it going"
+    # Non-ASCII text takes a different path, but gets stripped the same way
+    assert strip_text("Héllo, Wörld! How's it going?") == "héllo wörld hows it going"
+
+
+def test_strip_texts():
+    texts = ["Hello, World!", "", "How's it going?"]
+    assert strip_texts(texts) == [strip_text(text) for text in texts]
+    assert strip_texts([]) == []
+
+    texts_with_separator = ["Hello,\x00World!", "How's it going?"]
+    assert strip_texts(texts_with_separator) == [strip_text(t) for t in texts_with_separator]
 
 
 # Test post_is_an_image
@@ -64,20 +125,31 @@ def test_post_is_an_image():
     post_non_image = MagicMock(url="http://example.com/text-post")
     assert not post_is_an_image(post_non_image)
 
+    for url in [
+        "https://i.redd.it/abc.jpeg",
+        "https://i.redd.it/abc.png",
+        "https://imgur.com/a/abc",
+        "https://v.redd.it/abc",
+        "https://www.reddit.com/gallery/abc",
+    ]:
+        assert post_is_an_image(MagicMock(url=url))
+    assert not post_is_an_image(MagicMock(url="https://www.reddit.com/r/curlyhair/comments/abc/"))
+
+
+# Test time_elapsed_since_post
+@patch("curlbot_v2._submission_helpers.time.time", return_value=1693212027)
+def test_time_elapsed_since_post(mock_time):
+    post_created_utc = 1693211427
+    post = MagicMock(created_utc=post_created_utc)
 
-# # Test time_elapsed_since_post
-# def test_time_elapsed_since_post(monkeypatch, caplog):
-#     caplog.set_level("DEBUG")
-#     mock_utcnow = MagicMock()
-#     monkeypatch.setattr(datetime, "datetime", mock_utcnow)
-#     mock_utcnow.utcnow.return_value = datetime.datetime.utcfromtimestamp(1693212027)
+    elapsed_time_mins = time_elapsed_since_post(post)
+    logger.debug(f"{elapsed_time_mins=}")
+    assert elapsed_time_mins == 10  # 10 minutes
 
-#     post_created_utc = 1693211427
-#     post = MagicMock(created_utc=post_created_utc)
 
-#     elapsed_time_mins = time_elapsed_since_post(post)
-#     logger.debug(f"{elapsed_time_mins=}")
-#     assert elapsed_time_mins == 10  # 10 minutes
+def test_time_elapsed_since_post_given_now():
+    post = MagicMock(created_utc=1693211427)
+    assert time_elapsed_since_post(post, now_utc=1693212027) == 10
 
 
 # Test add_sticky_comment (requires more complex mocking)